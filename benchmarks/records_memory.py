@@ -0,0 +1,151 @@
+"""
+Memory benchmark of the scan records
+Builds synthetic describe pages for Auto Scaling Groups, RDS
+DBInstances and ElastiCache ReplicationGroups, then compares with
+tracemalloc the memory held by the raw boto3 dicts and by the
+records of scripts/records.py built while streaming the pages
+
+python benchmarks/records_memory.py --count 10000
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from scripts.records import (  # noqa: E402
+    iter_auto_scaling_groups, iter_db_instances, iter_replication_groups
+)
+
+PAGE_SIZE = 100
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(
+        description='Compare the memory of raw describe responses and scan records',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--count', type=int, default=10000,
+                        help='Number of resources of each type')
+    return parser.parse_args()
+
+
+def asg(index):
+    return {
+        'AutoScalingGroupName': 'asg-%d' % index,
+        'AutoScalingGroupARN': 'arn:aws:autoscaling:eu-west-3:123456789012:autoScalingGroup:%d:autoScalingGroupName/asg-%d' % (index, index),
+        'LaunchTemplate': {'LaunchTemplateId': 'lt-%017d' % index, 'Version': '$Latest'},
+        'MinSize': 1, 'MaxSize': 6, 'DesiredCapacity': 3, 'DefaultCooldown': 300,
+        'AvailabilityZones': ['eu-west-3a', 'eu-west-3b', 'eu-west-3c'],
+        'HealthCheckType': 'EC2', 'HealthCheckGracePeriod': 300,
+        'Instances': [
+            {'InstanceId': 'i-%017d' % (index * 3 + i), 'AvailabilityZone': 'eu-west-3a',
+             'LifecycleState': 'InService', 'HealthStatus': 'Healthy'}
+            for i in range(3)
+        ],
+        'VPCZoneIdentifier': 'subnet-%08da,subnet-%08db,subnet-%08dc' % (index, index, index),
+        'Tags': [{'Key': 'team', 'Value': 'chaos', 'PropagateAtLaunch': True}],
+        'TerminationPolicies': ['Default'],
+    }
+
+
+def db_instance(index):
+    return {
+        'DBInstanceIdentifier': 'db-%d' % index,
+        'DBInstanceClass': 'db.r5.large', 'Engine': 'postgres',
+        'DBInstanceStatus': 'available', 'MasterUsername': 'admin',
+        'Endpoint': {'Address': 'db-%d.abcdefgh.eu-west-3.rds.amazonaws.com' % index, 'Port': 5432},
+        'AllocatedStorage': 100, 'AvailabilityZone': 'eu-west-3a',
+        'SecondaryAvailabilityZone': 'eu-west-3b', 'MultiAZ': True,
+        'VpcSecurityGroups': [{'VpcSecurityGroupId': 'sg-%08d' % index, 'Status': 'active'}],
+        'DBSubnetGroup': {
+            'DBSubnetGroupName': 'subnets-%d' % index, 'VpcId': 'vpc-%08d' % (index % 10),
+            'SubnetGroupStatus': 'Complete',
+            'Subnets': [
+                {'SubnetIdentifier': 'subnet-%08d%s' % (index, az),
+                 'SubnetAvailabilityZone': {'Name': 'eu-west-3' + az},
+                 'SubnetStatus': 'Active'}
+                for az in 'abc'
+            ],
+        },
+        'PendingModifiedValues': {},
+        'TagList': [{'Key': 'team', 'Value': 'chaos'}],
+    }
+
+
+def replication_group(index):
+    return {
+        'ReplicationGroupId': 'rg-%d' % index,
+        'Description': 'replication group %d' % index,
+        'Status': 'available', 'AutomaticFailover': 'enabled', 'MultiAZ': 'enabled',
+        'MemberClusters': ['rg-%d-00%d' % (index, i) for i in range(1, 4)],
+        'NodeGroups': [{
+            'NodeGroupId': '0001', 'Status': 'available',
+            'PrimaryEndpoint': {'Address': 'rg-%d.abcdef.ng.0001.euw3.cache.amazonaws.com' % index, 'Port': 6379},
+            'NodeGroupMembers': [
+                {'CacheClusterId': 'rg-%d-00%d' % (index, i), 'CacheNodeId': '0001',
+                 'ReadEndpoint': {'Address': 'rg-%d-00%d.abcdef.0001.euw3.cache.amazonaws.com' % (index, i), 'Port': 6379},
+                 'PreferredAvailabilityZone': 'eu-west-3' + 'abc'[i - 1],
+                 'CurrentRole': 'primary' if i == 1 else 'replica'}
+                for i in range(1, 4)
+            ],
+        }],
+        'CacheNodeType': 'cache.r5.large', 'ClusterEnabled': False,
+    }
+
+
+class FakePaginator(object):
+
+    def __init__(self, key, build, count):
+        self.key = key
+        self.build = build
+        self.count = count
+
+    def paginate(self, **kwargs):
+        # Pages are built on demand, as botocore does when it streams them
+        for start in range(0, self.count, PAGE_SIZE):
+            end = min(start + PAGE_SIZE, self.count)
+            yield {self.key: [self.build(index) for index in range(start, end)]}
+
+
+class FakeClient(object):
+
+    def __init__(self, key, build, count):
+        self.paginator = FakePaginator(key, build, count)
+
+    def get_paginator(self, operation_name):
+        return self.paginator
+
+
+def measure(collect):
+    tracemalloc.start()
+    try:
+        kept = collect()
+        held = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return len(kept), held
+
+
+def main():
+    args = get_arguments()
+    resources = [
+        ('AutoScalingGroups', 'AutoScalingGroups', asg, iter_auto_scaling_groups),
+        ('DBInstances', 'DBInstances', db_instance, iter_db_instances),
+        ('ReplicationGroups', 'ReplicationGroups', replication_group, iter_replication_groups),
+    ]
+    print('%-18s %8s %14s %14s %8s' % ('resource', 'count', 'raw KiB', 'records KiB', 'ratio'))
+    for name, key, build, iterate in resources:
+        client = FakeClient(key, build, args.count)
+        count, raw = measure(lambda: [
+            item
+            for page in client.get_paginator(name).paginate()
+            for item in page[key]
+        ])
+        _, records = measure(lambda: list(iterate(client)))
+        print('%-18s %8d %14.1f %14.1f %7.1fx' % (
+            name, count, raw / 1024.0, records / 1024.0, float(raw) / records))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Cross-account sessions from assumed roles
+Roles are assumed concurrently and their credentials are cached per
+role ARN, botocore refreshes them shortly before they expire
+The per-account sessions share one data loader, so the service models
+are read and parsed once rather than once per account
+"""
+import threading
+
+import boto3
+import botocore.session
+from botocore.config import Config
+from botocore.credentials import CredentialProvider, RefreshableCredentials
+from concurrent.futures import ThreadPoolExecutor
+
+# Retry throttled calls harder when many accounts share the API rate limits
+ACCOUNT_CLIENT_CONFIG = Config(retries={'max_attempts': 10})
+
+_credentials_cache = {}
+_credentials_lock = threading.Lock()
+
+
+class Account(object):
+    __slots__ = ('role_arn', 'vpc_id', 'az_name', 'session')
+
+    def __init__(self, role_arn, vpc_id=None, az_name=None):
+        self.role_arn = role_arn
+        self.vpc_id = vpc_id
+        self.az_name = az_name
+        self.session = None
+
+    @property
+    def account_id(self):
+        if self.role_arn is None:
+            return 'default'
+        # arn:aws:iam::123456789012:role/name
+        return self.role_arn.split(':')[4]
+
+    @property
+    def key(self):
+        # As in the accounts file, the same role can target several VPCs
+        return ' '.join(str(field) for field in (self.role_arn, self.vpc_id, self.az_name))
+
+    def client(self, service_name, region):
+        if self.role_arn is None:
+            return self.session.client(service_name, region_name=region)
+        return self.session.client(
+            service_name, region_name=region, config=ACCOUNT_CLIENT_CONFIG)
+
+    def __repr__(self):
+        return 'Account(%s, %s, %s)' % (self.account_id, self.vpc_id, self.az_name)
+
+
+def default_account(vpc_id, az_name):
+    # The account of the default credentials, no role is assumed
+    if boto3.DEFAULT_SESSION is None:
+        boto3.setup_default_session()
+    account = Account(None, vpc_id, az_name)
+    account.session = boto3.DEFAULT_SESSION
+    return account
+
+
+class RoleCredentialProvider(CredentialProvider):
+    # Put first in a session's credential chain, it hands out the
+    # cached credentials of the assumed role
+    METHOD = 'chaos-assume-role'
+
+    def __init__(self, credentials):
+        super(RoleCredentialProvider, self).__init__()
+        self.credentials = credentials
+
+    def load(self):
+        return self.credentials
+
+
+def load_accounts(path, vpc_id=None, az_name=None):
+    # One account per line: ROLE_ARN [VPC_ID [AZ_NAME]]
+    # AZ names are mapped per account, so give AZ_NAME when they differ
+    accounts = []
+    with open(path) as accounts_file:
+        for line in accounts_file:
+            fields = line.split('#', 1)[0].split()
+            if not fields:
+                continue
+            account = Account(
+                fields[0],
+                fields[1] if len(fields) > 1 else vpc_id,
+                fields[2] if len(fields) > 2 else az_name
+            )
+            if account.vpc_id is None or account.az_name is None:
+                raise ValueError(
+                    'Missing VPC ID or AZ name for %s' % account.role_arn)
+            accounts.append(account)
+    return accounts
+
+
+def get_role_credentials(sts_client, role_arn, session_name='chaos-aws'):
+    with _credentials_lock:
+        credentials = _credentials_cache.get(role_arn)
+    if credentials is not None:
+        return credentials
+
+    def refresh():
+        response = sts_client.assume_role(
+            RoleArn=role_arn,
+            RoleSessionName=session_name
+        )
+        role_credentials = response['Credentials']
+        return {
+            'access_key': role_credentials['AccessKeyId'],
+            'secret_key': role_credentials['SecretAccessKey'],
+            'token': role_credentials['SessionToken'],
+            'expiry_time': role_credentials['Expiration'].isoformat(),
+        }
+
+    credentials = RefreshableCredentials.create_from_metadata(
+        metadata=refresh(),
+        refresh_using=refresh,
+        method='sts-assume-role'
+    )
+    with _credentials_lock:
+        return _credentials_cache.setdefault(role_arn, credentials)
+
+
+def assume_roles(accounts, region, max_workers=8, session=None):
+    if session is None:
+        session = boto3.DEFAULT_SESSION or boto3.Session()
+    sts_client = session.client('sts', region_name=region)
+    loader = botocore.session.get_session().get_component('data_loader')
+
+    def assume(account):
+        botocore_session = botocore.session.get_session()
+        # boto3.Session appends its own data path to the loader, after
+        # botocore's, where the client models are found first
+        botocore_session.register_component('data_loader', loader)
+        botocore_session.get_component('credential_provider').insert_before(
+            'env', RoleCredentialProvider(
+                get_role_credentials(sts_client, account.role_arn)))
+        account.session = boto3.Session(
+            botocore_session=botocore_session, region_name=region)
+        return account
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(assume, accounts))
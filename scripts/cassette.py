@@ -0,0 +1,242 @@
+"""
+Record and replay of the AWS API traffic of a run
+Recording captures every botocore call (parameters, parsed response,
+status and latency) into a gzipped JSON lines cassette
+Replaying serves the cassette from botocore's before-call hook, at the
+recorded latencies or at full speed, so no request leaves the machine
+At full speed the scheduler runs on a virtual clock: the recorded
+latencies, fault window, waves and retry backoffs advance it instead of
+sleeping, so the timing reports still match the recorded run
+Calls are matched per account, the key given when installing on the
+account's session, then per service and operation in recorded order
+The virtual clock is shared: calls from accounts running concurrently
+add up on it, so with several accounts the virtual time, wave lag and
+apply time include the other accounts' API time and are only an upper
+bound
+"""
+import contextlib
+import datetime
+import functools
+import gzip
+import json
+import threading
+import time
+
+from collections import deque
+
+import boto3
+from botocore.awsrequest import AWSResponse
+from dateutil.parser import parse as parse_datetime
+
+try:
+    from scripts.scheduler import VirtualClock, use_clock
+except ImportError:  # run as python scripts/<script>.py
+    from scheduler import VirtualClock, use_clock
+
+CASSETTE_VERSION = 1
+
+
+class CassetteError(Exception):
+    pass
+
+
+def _encode(value):
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError('Cannot record %r' % (value,))
+
+
+def _decode(value):
+    if '__datetime__' in value and len(value) == 1:
+        return parse_datetime(value['__datetime__'])
+    return value
+
+
+def _dumps(value):
+    return json.dumps(value, default=_encode, separators=(',', ':'))
+
+
+class Cassette(object):
+
+    def __init__(self, path, mode, realtime=False):
+        if mode not in ('record', 'replay'):
+            raise CassetteError('Unknown cassette mode %s' % mode)
+        self.path = path
+        self.mode = mode
+        self.realtime = realtime
+        self.virtual_clock = None
+        if mode == 'replay' and not realtime:
+            self.virtual_clock = VirtualClock()
+        self.interactions = []
+        # replay queues, by (account, service, operation)
+        self.queues = {}
+        self.recorded_wall_time = None
+        self.calls = {}
+        self.api_time = 0.0
+        self.started = None
+        self.ended = None
+        self.virtual_started = None
+        self._events = []
+        self._lock = threading.Lock()
+        if mode == 'replay':
+            self.load()
+
+    def load(self):
+        with gzip.open(self.path, 'rt') as cassette_file:
+            header = json.loads(cassette_file.readline())
+            if header.get('version') != CASSETTE_VERSION:
+                raise CassetteError(
+                    'Unsupported cassette version %s' % header.get('version'))
+            self.recorded_wall_time = header.get('wall_time')
+            for line in cassette_file:
+                interaction = json.loads(line, object_hook=_decode)
+                self.queues.setdefault(
+                    self._key(interaction), deque()).append(interaction)
+
+    def save(self):
+        header = {
+            'version': CASSETTE_VERSION,
+            'calls': len(self.interactions),
+            'wall_time': round(self.ended - self.started, 3),
+        }
+        with gzip.open(self.path, 'wt') as cassette_file:
+            cassette_file.write(_dumps(header) + '\n')
+            for interaction in self.interactions:
+                cassette_file.write(_dumps(interaction) + '\n')
+
+    def install(self, events, account=None):
+        # Clients copy the session handlers when they are created,
+        # so install before any client is built. It can be installed
+        # on several sessions, e.g. one per assumed role, account tells
+        # their calls apart and must be the same when replaying
+        capture_params = functools.partial(self._capture_params, account)
+        events.register('before-parameter-build.*.*', capture_params)
+        events.register_first('before-call.*.*', self._before_call)
+        events.register('after-call.*.*', self._after_call)
+        self._events.append((events, capture_params))
+        if self.started is None:
+            self.started = time.monotonic()
+            if self.virtual_clock is not None:
+                self.virtual_started = self.virtual_clock.monotonic()
+
+    def uninstall(self):
+        self.ended = time.monotonic()
+        for events, capture_params in self._events:
+            events.unregister('before-parameter-build.*.*', capture_params)
+            events.unregister('before-call.*.*', self._before_call)
+            events.unregister('after-call.*.*', self._after_call)
+        self._events = []
+
+    def _capture_params(self, account, params, model, context, **kwargs):
+        context['cassette'] = {
+            'account': account,
+            'service': model.service_model.service_name,
+            'operation': model.name,
+            'params': json.loads(_dumps(params)),
+        }
+
+    def _before_call(self, model, context, **kwargs):
+        call = context['cassette']
+        self._count(call)
+        if self.mode == 'record':
+            call['started'] = time.monotonic()
+            return None
+        interaction = self._next_interaction(call)
+        if self.realtime:
+            time.sleep(interaction['latency'])
+        else:
+            self.virtual_clock.sleep(interaction['latency'])
+        http_response = AWSResponse(None, interaction['status'], {}, None)
+        return http_response, interaction['response']
+
+    def _after_call(self, http_response, parsed, model, context, **kwargs):
+        if self.mode != 'record':
+            return
+        call = context['cassette']
+        latency = time.monotonic() - call.pop('started')
+        response = dict(parsed)
+        response.pop('ResponseMetadata', None)
+        call.update({
+            'status': http_response.status_code,
+            'latency': round(latency, 6),
+            'response': response,
+        })
+        with self._lock:
+            self.api_time += latency
+            self.interactions.append(call)
+
+    def _count(self, call):
+        key = '%s.%s' % (call['service'], call['operation'])
+        with self._lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+    @staticmethod
+    def _key(call):
+        return call.get('account'), call['service'], call['operation']
+
+    def _next_interaction(self, call):
+        # Oldest interaction of the same account and operation, preferring
+        # identical parameters so concurrent calls still line up
+        with self._lock:
+            queue = self.queues.get(self._key(call))
+            if not queue:
+                raise CassetteError('No recorded interaction left for %s.%s in %s' % (
+                    call['service'], call['operation'], call['account'] or 'default'))
+            if queue[0]['params'] == call['params']:
+                interaction = queue.popleft()
+            else:
+                interaction = next(
+                    (item for item in queue if item['params'] == call['params']),
+                    queue[0])
+                queue.remove(interaction)
+            self.api_time += interaction['latency']
+            return interaction
+
+    def summary(self):
+        summary = {
+            'cassette_mode': self.mode,
+            'cassette': self.path,
+            'api_calls': sum(self.calls.values()),
+            'api_calls_by_operation': self.calls,
+            'api_time': round(self.api_time, 3),
+            'wall_time': round(self.ended - self.started, 3),
+        }
+        if self.virtual_clock is not None:
+            summary['virtual_time'] = round(
+                self.virtual_clock.monotonic() - self.virtual_started, 3)
+        if self.mode == 'replay':
+            summary['recorded_wall_time'] = self.recorded_wall_time
+            summary['unused_interactions'] = sum(
+                len(queue) for queue in self.queues.values())
+        return summary
+
+
+@contextlib.contextmanager
+def use_cassette(record=None, replay=None, realtime=False, session=None):
+    # Does nothing when neither record nor replay is given
+    if record and replay:
+        raise CassetteError('Cannot record and replay at the same time')
+    if not record and not replay:
+        yield None
+        return
+    if record:
+        cassette = Cassette(record, 'record')
+    else:
+        cassette = Cassette(replay, 'replay', realtime)
+    if session is None:
+        if boto3.DEFAULT_SESSION is None:
+            boto3.setup_default_session()
+        session = boto3.DEFAULT_SESSION
+    cassette.install(session.events)
+    try:
+        if cassette.virtual_clock is None:
+            yield cassette
+        else:
+            virtual_clock = cassette.virtual_clock
+            with use_clock(virtual_clock.monotonic, virtual_clock.sleep):
+                yield cassette
+    finally:
+        cassette.uninstall()
+        # keep what was recorded even if the run failed
+        if cassette.mode == 'record':
+            cassette.save()
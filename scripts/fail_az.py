@@ -7,11 +7,29 @@ Optional: it can also failover the RDS database.
 """
 import argparse
 import logging
-import boto3
-import time
 
+from concurrent.futures import ThreadPoolExecutor
 from pythonjsonlogger import jsonlogger
 
+try:
+    from scripts.records import (
+        iter_auto_scaling_groups, iter_db_instances, iter_replication_groups
+    )
+    from scripts.scheduler import FaultWindow, batches, run_waves
+    from scripts.verify import verify_and_repair
+    from scripts.cassette import use_cassette
+    from scripts.profiler import profile_run, start_phase
+    from scripts.accounts import assume_roles, default_account, load_accounts
+except ImportError:  # run as python scripts/fail_az.py
+    from records import (
+        iter_auto_scaling_groups, iter_db_instances, iter_replication_groups
+    )
+    from scheduler import FaultWindow, batches, run_waves
+    from verify import verify_and_repair
+    from cassette import use_cassette
+    from profiler import profile_run, start_phase
+    from accounts import assume_roles, default_account, load_accounts
+
 
 def setup_logging(log_level):
     logger = logging.getLogger(__name__)
@@ -30,12 +48,16 @@ def get_arguments():
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument('--region', type=str, required=True,
                         help='The AWS region of choice')
-    parser.add_argument('--vpc-id', type=str, required=True,
-                        help='The VPC ID of choice')
+    parser.add_argument('--vpc-id', type=str, default=None,
+                        help='The VPC ID of choice, required without --accounts')
     parser.add_argument('--az-name', type=str, required=True,
                         help='The name of the availability zone to blackout')
     parser.add_argument('--duration', type=int, default=60,
                         help='The duration, in seconds, of the blackout')
+    parser.add_argument('--wave-size', type=int, default=0,
+                        help='Number of subnets to blackhole per wave, 0 for all at once')
+    parser.add_argument('--wave-interval', type=int, default=0,
+                        help='The interval, in seconds, between two waves')
     parser.add_argument('--limit-asg', default=False, action='store_true',
                         help='Remove "failed" AZ from Auto Scaling Group (ASG)')
     parser.add_argument('--failover-rds', default=False, action='store_true',
@@ -44,7 +66,22 @@ def get_arguments():
                         help='Failover Elasticache if primary in the blackout subnet')
     parser.add_argument('--log-level', type=str, default='INFO',
                         help='Python log level. INFO, DEBUG, etc.')
-    return parser.parse_args()
+    parser.add_argument('--record', type=str, default=None, metavar='CASSETTE',
+                        help='Record the AWS API traffic of the run to a cassette file')
+    parser.add_argument('--replay', type=str, default=None, metavar='CASSETTE',
+                        help='Replay the AWS API traffic from a cassette file instead of calling AWS')
+    parser.add_argument('--replay-realtime', default=False, action='store_true',
+                        help='Replay at the recorded latencies instead of full speed')
+    parser.add_argument('--profile', type=str, nargs='?', const='profile', default=None, metavar='PREFIX',
+                        help='Profile the run per phase, write PREFIX.txt, PREFIX.collapsed and PREFIX-<phase>.pstats')
+    parser.add_argument('--accounts', type=str, default=None,
+                        help='File of accounts to blackout together, one "ROLE_ARN [VPC_ID [AZ_NAME]]" per line')
+    parser.add_argument('--max-concurrency', type=int, default=8,
+                        help='Maximum number of accounts processed concurrently')
+    args = parser.parse_args()
+    if args.accounts is None and args.vpc_id is None:
+        parser.error('--vpc-id is required without --accounts')
+    return args
 
 
 def create_chaos_nacl(ec2_client, vpc_id):
@@ -138,60 +175,55 @@ def get_nacls_to_chaos(ec2_client, subnets_to_chaos):
             if nacl_ass['SubnetId'] in subnets_to_chaos:
                 nacl_ass_id, nacl_id = nacl_ass[
                     'NetworkAclAssociationId'], nacl_ass['NetworkAclId']
-                nacl_ids.append((nacl_ass_id, nacl_id))
+                nacl_ids.append((nacl_ass_id, nacl_id, nacl_ass['SubnetId']))
 
     return nacl_ids
 
-def limit_auto_scaling(autoscaling_client, subnets_to_chaos):
+def get_asg_to_chaos(autoscaling_client, subnets_to_chaos):
     logger = logging.getLogger(__name__)
-    logger.info('Limit autoscaling to the remaining subnets')
-
-    # Get info on all the AutoScalingGroups (ASGs) in the region
-    response = autoscaling_client.describe_auto_scaling_groups()
-    asgs = response['AutoScalingGroups']
+    logger.info('Getting the ASG to limit')
 
+    # Walk the AutoScalingGroups (ASGs) in the region page by page
     # Find the ASG we need to modify
     # (makes assumption that only one ASG should be impacted)
-    correct_asg = False
-    for asg in asgs:
-
-        asg_name = asg['AutoScalingGroupName']
-        asg_subnets = asg['VPCZoneIdentifier'].split(',')
-
-        subnets_to_keep = list(set(asg_subnets)-set(subnets_to_chaos))
-
+    for asg in iter_auto_scaling_groups(autoscaling_client):
         # if the any of the subnets_to_chaos are in this ASG
         # then it is the ASG we will modify
-        correct_asg = len(subnets_to_keep) < len(asg_subnets)
-        if correct_asg: break
+        if set(asg.subnets) & set(subnets_to_chaos):
+            return asg
+    logger.error("Cannot find impacted ASG")
+    return None
 
-    # If we find an impacted ASG, we remove the subnets for the "failed AZ".  
+
+def limit_auto_scaling(autoscaling_client, correct_asg, subnets_to_chaos):
+    logger = logging.getLogger(__name__)
+    logger.info('Limit autoscaling to the remaining subnets')
+
+    # Remove the subnets for the "failed AZ" from the impacted ASG.
     # In a real AZ failure ASG would not put new instances into this AZ
-    if correct_asg:
-        try:
-            vpczoneidentifier = ",".join(subnets_to_keep)
-            response = autoscaling_client.update_auto_scaling_group(AutoScalingGroupName=asg_name, VPCZoneIdentifier=vpczoneidentifier)
-            return asg
-        except:
-            logger.error("Unable to update ASG:")
-            logger.error("response: " + str(response))
-            return None
-    else:
-        logger.error("Cannot find impacted ASG")
+    subnets_to_keep = list(set(correct_asg.subnets)-set(subnets_to_chaos))
+    try:
+        vpczoneidentifier = ",".join(subnets_to_keep)
+        autoscaling_client.update_auto_scaling_group(AutoScalingGroupName=correct_asg.name, VPCZoneIdentifier=vpczoneidentifier)
+        return correct_asg
+    except Exception as e:
+        logger.error("Unable to update ASG %s:", correct_asg.name)
+        logger.error(e)
         return None
 
-def apply_chaos_config(ec2_client, nacl_ids, chaos_nacl_id):
+def apply_chaos_config(ec2_client, nacl_ids, chaos_nacl_id, save_for_rollback):
     logger = logging.getLogger(__name__)
     logger.info('Saving original config & applying new chaos config')
-    save_for_rollback = []
     # Modify the association of the subnets_to_chaos with the Chaos NetworkACL
-    for nacl_ass_id, nacl_id in nacl_ids:
+    # Save each one as soon as it is replaced, a failure half way through
+    # must still leave the earlier ones to roll back
+    for nacl_ass_id, nacl_id, subnet_id in nacl_ids:
         response = ec2_client.replace_network_acl_association(
             AssociationId=nacl_ass_id,
             NetworkAclId=chaos_nacl_id
         )
-        save_for_rollback.append((response['NewAssociationId'], nacl_id))
-    return save_for_rollback
+        save_for_rollback.append(
+            (response['NewAssociationId'], nacl_id, subnet_id))
 
 
 def confirm_choice():
@@ -208,13 +240,12 @@ def confirm_choice():
 def force_failover_rds(rds_client, vpc_id, az_name):
     logger = logging.getLogger(__name__)
     # Find RDS master instances within the AZ
-    rds_dbs = rds_client.describe_db_instances()
-    for rds_db in rds_dbs['DBInstances']:
-        if rds_db['DBSubnetGroup']['VpcId'] == vpc_id:
-            if rds_db['AvailabilityZone'] == az_name and rds_db['MultiAZ']:
+    for rds_db in iter_db_instances(rds_client):
+        if rds_db.vpc_id == vpc_id:
+            if rds_db.availability_zone == az_name and rds_db.multi_az:
                 logger.info(
-                    'Database found in VPC: %s and AZ: %s', rds_db[
-                        'DBInstanceIdentifier'], rds_db['AvailabilityZone']
+                    'Database found in VPC: %s and AZ: %s',
+                    rds_db.identifier, rds_db.availability_zone
                 )
                 # if RDS master is multi-az and in blackholed AZ
                 # force reboot with failover
@@ -222,7 +253,7 @@ def force_failover_rds(rds_client, vpc_id, az_name):
                 if confirm == 'c':
                     logger.info('Force reboot/failover')
                     rds_client.reboot_db_instance(
-                        DBInstanceIdentifier=rds_db['DBInstanceIdentifier'],
+                        DBInstanceIdentifier=rds_db.identifier,
                         ForceFailover=True
                     )
                 else:
@@ -231,48 +262,122 @@ def force_failover_rds(rds_client, vpc_id, az_name):
 
 def force_failover_elasticache(elasticache_client, az_name):
     logger = logging.getLogger(__name__)
-    replication_groups = elasticache_client.describe_replication_groups()
-    for replication in replication_groups['ReplicationGroups']:
-        if replication['AutomaticFailover'] == 'enabled':
+    for replication in iter_replication_groups(elasticache_client):
+        if replication.automatic_failover:
             # find if primary node in blackout AZ
-            for nodes in replication['NodeGroups']:
-                for node in nodes['NodeGroupMembers']:
-                    if node['CurrentRole'] == 'primary' and node['PreferredAvailabilityZone'] == az_name:
-                        print(node)
-                        ReplicationGroupId = replication['ReplicationGroupId']
-                        NodeGroupId = node['CacheNodeId']
-                        logger.info(
-                            'cluster with ReplicationGroupId %s and NodeGroupId %s found with primary node in %s',
-                            ReplicationGroupId,
-                            NodeGroupId,
-                            node['PreferredAvailabilityZone']
+            for node in replication.members:
+                if node.is_primary and node.availability_zone == az_name:
+                    logger.info(
+                        'cluster with ReplicationGroupId %s and NodeGroupId %s found with primary node in %s',
+                        replication.replication_group_id,
+                        node.cache_node_id,
+                        node.availability_zone
+                    )
+                    confirm = confirm_choice()
+                    if confirm == 'c':
+                        logger.info('Force automatic failover; no rollback possible')
+                        elasticache_client.test_failover(
+                            ReplicationGroupId=replication.replication_group_id,
+                            NodeGroupId=node.cache_node_id
                         )
-                        confirm = confirm_choice()
-                        if confirm == 'c':
-                            logger.info('Force automatic failover; no rollback possible')
-                            elasticache_client.test_failover(
-                                ReplicationGroupId=ReplicationGroupId,
-                                NodeGroupId=NodeGroupId
-                            )
-                        else:
-                            logger.info('Failover aborted')
+                    else:
+                        logger.info('Failover aborted')
 
 
 def rollback(ec2_client, save_for_rollback, autoscaling_client, original_asg):
     logger = logging.getLogger(__name__)
     logger.info('Rolling back Network ACL to original configuration')
     # Rollback the initial association
-    for nacl_ass_id, nacl_id in save_for_rollback:
-        ec2_client.replace_network_acl_association(
-            AssociationId=nacl_ass_id,
-            NetworkAclId=nacl_id
-        )
+    # keep going on errors, the verification pass repairs what is left
+    for nacl_ass_id, nacl_id, _ in save_for_rollback:
+        try:
+            ec2_client.replace_network_acl_association(
+                AssociationId=nacl_ass_id,
+                NetworkAclId=nacl_id
+            )
+        except Exception as e:
+            logger.error('Unable to restore association %s: %s', nacl_ass_id, e)
     if original_asg is not None:
         logger.info('Rolling back AutoScalingGroup to original configuration')
-        asg_name = original_asg['AutoScalingGroupName']
-        asg_subnets = original_asg['VPCZoneIdentifier'].split(',')
-        vpczoneidentifier = ",".join(asg_subnets)
-        autoscaling_client.update_auto_scaling_group(AutoScalingGroupName=asg_name, VPCZoneIdentifier=vpczoneidentifier)
+        try:
+            autoscaling_client.update_auto_scaling_group(
+                AutoScalingGroupName=original_asg.name,
+                VPCZoneIdentifier=original_asg.vpc_zone_identifier
+            )
+        except Exception as e:
+            logger.error('Unable to restore ASG %s: %s', original_asg.name, e)
+
+
+def get_rollback_drift(ec2_client, autoscaling_client, chaos):
+    # Compare the live state with the baseline saved before the chaos
+    # with one describe per resource type
+    baseline = {
+        subnet_id: nacl_id for _, nacl_id, subnet_id in chaos['save_for_rollback']
+    }
+    drift = []
+    # Every NACL of the VPC, so associations left on the Chaos NACL are
+    # found even when they are missing from the baseline
+    acls_response = ec2_client.describe_network_acls(
+        Filters=[
+            {
+                'Name': 'vpc-id',
+                'Values': [chaos['vpc_id']]
+            }
+        ]
+    )
+    network_acls = acls_response['NetworkAcls']
+    default_nacl_id = next(
+        (nacl['NetworkAclId'] for nacl in network_acls if nacl['IsDefault']), None)
+    for nacl in network_acls:
+        for nacl_ass in nacl['Associations']:
+            expected = baseline.get(nacl_ass['SubnetId'])
+            if expected is None and nacl['NetworkAclId'] == chaos['chaos_nacl_id']:
+                # no saved original, fall back to the VPC default NACL
+                expected = default_nacl_id
+            if expected is not None and nacl_ass['NetworkAclId'] != expected:
+                drift.append(
+                    ('nacl', nacl_ass['NetworkAclAssociationId'], expected))
+    original_asg = chaos['original_asg']
+    if original_asg is not None:
+        response = autoscaling_client.describe_auto_scaling_groups(
+            AutoScalingGroupNames=[original_asg.name]
+        )
+        for asg in response['AutoScalingGroups']:
+            asg_subnets = set(asg['VPCZoneIdentifier'].split(','))
+            if asg_subnets != set(original_asg.subnets):
+                drift.append(
+                    ('asg', original_asg.name, original_asg.vpc_zone_identifier))
+    return drift
+
+
+def repair_rollback_drift(ec2_client, autoscaling_client, item):
+    kind, resource_id, expected = item
+    if kind == 'nacl':
+        ec2_client.replace_network_acl_association(
+            AssociationId=resource_id,
+            NetworkAclId=expected
+        )
+    else:
+        autoscaling_client.update_auto_scaling_group(
+            AutoScalingGroupName=resource_id,
+            VPCZoneIdentifier=expected
+        )
+
+
+def verify_rollback(ec2_client, autoscaling_client, chaos, started=None):
+    logger = logging.getLogger(__name__)
+    logger.info('Verifying rollback against the original configuration')
+    report = verify_and_repair(
+        lambda: get_rollback_drift(ec2_client, autoscaling_client, chaos),
+        lambda item: repair_rollback_drift(
+            ec2_client, autoscaling_client, item),
+        started=started
+    )
+    if report['clean']:
+        logger.info('Rollback verified clean', extra=report)
+    else:
+        logger.error('Rollback drift remains', extra=report)
+    return report['clean']
 
 
 def delete_chaos_nacl(ec2_client, chaos_nacl_id):
@@ -284,53 +389,212 @@ def delete_chaos_nacl(ec2_client, chaos_nacl_id):
     )
 
 
-def run(region, az_name, vpc_id, duration, limit_asg, failover_rds, failover_elasticache, log_level='INFO'):
-    setup_logging(log_level)
-    logger = logging.getLogger(__name__)
-    logger.info('Setting up ec2 client for region %s ', region)
-    ec2_client = boto3.client('ec2', region_name=region)
-    autoscaling_client = boto3.client('autoscaling', region_name=region)
-    chaos_nacl_id = create_chaos_nacl(ec2_client, vpc_id)
+def discover_chaos(ec2_client, autoscaling_client, vpc_id, az_name, limit_asg):
+    # Read only, nothing to roll back if it fails
     subnets_to_chaos = get_subnets_to_chaos(ec2_client, vpc_id, az_name)
     nacl_ids = get_nacls_to_chaos(ec2_client, subnets_to_chaos)
+    asg = None
+    if limit_asg:
+        asg = get_asg_to_chaos(autoscaling_client, subnets_to_chaos)
+    return subnets_to_chaos, nacl_ids, asg
+
+
+def inject_chaos(ec2_client, autoscaling_client, vpc_id, target, wave_size, wave_interval, chaos):
+    # chaos is filled as we go so a failed injection can still be rolled back
+    logger = logging.getLogger(__name__)
+    subnets_to_chaos, nacl_ids, asg = target
+    chaos['vpc_id'] = vpc_id
+    chaos['chaos_nacl_id'] = create_chaos_nacl(ec2_client, vpc_id)
 
     # Limit AutoScalingGroup to no longer include failed AZ
-    if limit_asg:
-        original_asg = limit_auto_scaling(autoscaling_client, subnets_to_chaos)
-    else:
-        original_asg = None
+    if asg is not None:
+        chaos['original_asg'] = limit_auto_scaling(autoscaling_client, asg, subnets_to_chaos)
 
     # Blackhole networking to EC2 instances in failed AZ
-    save_for_rollback = apply_chaos_config(ec2_client, nacl_ids, chaos_nacl_id)
+    # in waves of wave_size subnets, wave_interval seconds apart
+    waves = run_waves(
+        batches(nacl_ids, wave_size),
+        wave_interval,
+        lambda wave: apply_chaos_config(
+            ec2_client, wave, chaos['chaos_nacl_id'], chaos['save_for_rollback'])
+    )
+    for wave in waves:
+        logger.info('Blackhole wave applied', extra=wave)
+    return chaos
+
+
+def restore_chaos(ec2_client, autoscaling_client, chaos, started=None):
+    logger = logging.getLogger(__name__)
+    save_for_rollback = chaos['save_for_rollback']
+    original_asg = chaos['original_asg']
+    rollback(ec2_client, save_for_rollback,  autoscaling_client, original_asg)
+    if chaos['chaos_nacl_id'] is None:
+        return True
+    # The Chaos NACL cannot be deleted while a subnet is still associated
+    if verify_rollback(ec2_client, autoscaling_client, chaos, started):
+        delete_chaos_nacl(ec2_client, chaos['chaos_nacl_id'])
+        return True
+    logger.error('Keeping the Chaos NACL %s, fix the drift and delete it manually', chaos['chaos_nacl_id'])
+    return False
+
+
+def new_chaos():
+    return {'vpc_id': None, 'chaos_nacl_id': None, 'save_for_rollback': [], 'original_asg': None}
 
-    # Fail-over RDS if in the "failed" AZ
-    if failover_rds:
-        rds_client = boto3.client('rds', region_name=region)
-        force_failover_rds(rds_client, vpc_id, az_name)
 
-    # Fail-over Elasticache if in the "failed" AZ
+def _each_account(func, items, max_workers):
+    # A single account stays in this thread, where the profiler sees its phases
+    if len(items) == 1:
+        return [func(items[0])]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(func, items))
+
+
+def run_chaos(region, accounts, duration, limit_asg, failover_rds, failover_elasticache, wave_size=0, wave_interval=0, max_concurrency=8):
+    logger = logging.getLogger(__name__)
+
+    services = ['ec2', 'autoscaling']
+    if failover_rds:
+        services.append('rds')
     if failover_elasticache:
-        elasticache_client = boto3.client('elasticache', region_name=region)
-        force_failover_elasticache(elasticache_client, az_name)
+        services.append('elasticache')
 
-    time.sleep(duration)
-    rollback(ec2_client, save_for_rollback,  autoscaling_client, original_asg)
-    delete_chaos_nacl(ec2_client, chaos_nacl_id)
+    def connect(account):
+        return account, {service: account.client(service, region) for service in services}
+
+    def discover(connection):
+        account, clients = connection
+        try:
+            target = discover_chaos(
+                clients['ec2'], clients['autoscaling'], account.vpc_id,
+                account.az_name, limit_asg)
+        except Exception as e:
+            logger.error('Discovery failed in %s: %s', account.account_id, e)
+            target = None
+        return account, clients, target
+
+    def inject(discovery):
+        account, clients, target = discovery
+        chaos = new_chaos()
+        if target is None:
+            return account, clients, chaos, False
+        try:
+            inject_chaos(
+                clients['ec2'], clients['autoscaling'], account.vpc_id,
+                target, wave_size, wave_interval, chaos)
+            logger.info('Chaos injected', extra={'account': account.account_id})
+            injected = True
+        except Exception as e:
+            logger.error('Chaos injection failed in %s: %s', account.account_id, e)
+            injected = False
+        return account, clients, chaos, injected
+
+    # Building the clients loads the service models, keep it out of injection
+    connections = _each_account(connect, accounts, max_concurrency)
+
+    # Discover, then inject, in every account concurrently, within
+    # max_concurrency. All accounts finish discovery before any injection
+    start_phase('discovery')
+    discoveries = _each_account(discover, connections, max_concurrency)
+    start_phase('injection')
+    injections = _each_account(inject, discoveries, max_concurrency)
+
+    # The fault window starts once every subnet is blackholed and is
+    # shared by all accounts, failovers below run inside it
+    fault_window = FaultWindow(duration)
+    fault_window.start()
+
+    # Failovers prompt for confirmation, so go through the accounts one by one
+    for account, clients, _, injected in injections:
+        if not injected:
+            continue
+        if failover_rds:
+            force_failover_rds(clients['rds'], account.vpc_id, account.az_name)
+        if failover_elasticache:
+            force_failover_elasticache(clients['elasticache'], account.az_name)
+
+    start_phase('hold')
+    fault_window.wait()
+    logger.info('Fault window ended', extra=fault_window.report())
+    start_phase('rollback')
+
+    def restore(injection):
+        account, clients, chaos, _ = injection
+        # partially injected accounts are rolled back too
+        try:
+            clean = restore_chaos(
+                clients['ec2'], clients['autoscaling'], chaos, fault_window.ended)
+        except Exception as e:
+            logger.error('Rollback failed in %s: %s', account.account_id, e)
+            clean = False
+        logger.info('Account rolled back', extra={
+            'account': account.account_id, 'clean': clean})
+        return clean
+
+    results = _each_account(restore, injections, max_concurrency)
+    logger.info('Run done', extra={
+        'accounts': len(accounts), 'clean': results.count(True)})
+    return results
+
+
+def run(region, az_name, vpc_id, duration, limit_asg, failover_rds, failover_elasticache, log_level='INFO', wave_size=0, wave_interval=0):
+    setup_logging(log_level)
+    logger = logging.getLogger(__name__)
+    logger.info('Setting up ec2 client for region %s ', region)
+    return run_chaos(
+        region, [default_account(vpc_id, az_name)], duration, limit_asg,
+        failover_rds, failover_elasticache, wave_size, wave_interval)
+
+
+def run_accounts(region, accounts, duration, limit_asg, failover_rds, failover_elasticache, log_level='INFO', wave_size=0, wave_interval=0, max_concurrency=8, cassette=None):
+    setup_logging(log_level)
+    logger = logging.getLogger(__name__)
+    logger.info('Assuming roles in %d accounts', len(accounts))
+    assume_roles(accounts, region, max_concurrency)
+    if cassette is not None:
+        for account in accounts:
+            cassette.install(account.session.events, account.key)
+    return run_chaos(
+        region, accounts, duration, limit_asg, failover_rds,
+        failover_elasticache, wave_size, wave_interval, max_concurrency)
 
 
 def entry_point():
     args = get_arguments()
     print(args)
-    run(
-        args.region,
-        args.az_name,
-        args.vpc_id,
-        args.duration,
-        args.limit_asg,
-        args.failover_rds,
-        args.failover_elasticache,
-        args.log_level
-    )
+    with profile_run(args.profile) as profiler:
+        with use_cassette(args.record, args.replay, args.replay_realtime) as cassette:
+            if args.accounts:
+                run_accounts(
+                    args.region,
+                    load_accounts(args.accounts, args.vpc_id, args.az_name),
+                    args.duration,
+                    args.limit_asg,
+                    args.failover_rds,
+                    args.failover_elasticache,
+                    args.log_level,
+                    args.wave_size,
+                    args.wave_interval,
+                    args.max_concurrency,
+                    cassette
+                )
+            else:
+                run(
+                    args.region,
+                    args.az_name,
+                    args.vpc_id,
+                    args.duration,
+                    args.limit_asg,
+                    args.failover_rds,
+                    args.failover_elasticache,
+                    args.log_level,
+                    args.wave_size,
+                    args.wave_interval
+                )
+        if cassette is not None:
+            logging.getLogger(__name__).info('AWS API traffic', extra=cassette.summary())
+    if profiler is not None:
+        logging.getLogger(__name__).info('Profile written', extra=profiler.report())
 
 
 if __name__ == '__main__':
@@ -8,6 +8,15 @@ import boto3
 
 from pythonjsonlogger import jsonlogger
 
+try:
+    from scripts.records import iter_replication_groups
+    from scripts.cassette import use_cassette
+    from scripts.profiler import profile_run, start_phase
+except ImportError:  # run as python scripts/fail_elasticache.py
+    from records import iter_replication_groups
+    from cassette import use_cassette
+    from profiler import profile_run, start_phase
+
 
 def setup_logging(log_level):
     logger = logging.getLogger(__name__)
@@ -34,6 +43,14 @@ def get_arguments():
                         help='The AZ where the primary node (master) is.')
     parser.add_argument('--log-level', type=str, default='INFO',
                         help='Python log level. INFO, DEBUG, etc.')
+    parser.add_argument('--record', type=str, default=None, metavar='CASSETTE',
+                        help='Record the AWS API traffic of the run to a cassette file')
+    parser.add_argument('--replay', type=str, default=None, metavar='CASSETTE',
+                        help='Replay the AWS API traffic from a cassette file instead of calling AWS')
+    parser.add_argument('--replay-realtime', default=False, action='store_true',
+                        help='Replay at the recorded latencies instead of full speed')
+    parser.add_argument('--profile', type=str, nargs='?', const='profile', default=None, metavar='PREFIX',
+                        help='Profile the run per phase, write PREFIX.txt, PREFIX.collapsed and PREFIX-<phase>.pstats')
 
     return parser.parse_args()
 
@@ -51,75 +68,72 @@ def confirm_choice():
 
 def force_failover_elasticache_az(elasticache_client, az_name):
     logger = logging.getLogger(__name__)
-    replication_groups = elasticache_client.describe_replication_groups()
-    for replication in replication_groups['ReplicationGroups']:
-        if replication['AutomaticFailover'] == 'enabled':
+    for replication in iter_replication_groups(elasticache_client):
+        if replication.automatic_failover:
             # find if primary node in blackout AZ
-            for nodes in replication['NodeGroups']:
-                for node in nodes['NodeGroupMembers']:
-                    if node['CurrentRole'] == 'primary' and node['PreferredAvailabilityZone'] == az_name:
-                        ReplicationGroupId = replication['ReplicationGroupId']
-                        NodeGroupId = node['CacheNodeId']
-                        logger.info(
-                            'cluster with ReplicationGroupId %s and NodeGroupId %s found with primary node in %s',
-                            ReplicationGroupId,
-                            NodeGroupId,
-                            node['PreferredAvailabilityZone']
-                        )
-                        confirm = confirm_choice()
-                        if confirm == 'c':
-                            logger.info('Force automatic failover; no rollback possible')
-                            try:
-                                elasticache_client.test_failover(
-                                    ReplicationGroupId=ReplicationGroupId,
-                                    NodeGroupId=NodeGroupId
-                                )
-                                return
-                            except (Exception) as e:
-                                logger.error(e)
-                        else:
-                            logger.info('Failover aborted')
-
-                    elif node['CurrentRole'] == 'primary' and node['PreferredAvailabilityZone'] != az_name:
-                        logger.info('Primary node %s found but not in %s', node['CacheClusterId'], az_name)
-
+            for node in replication.members:
+                if node.is_primary and node.availability_zone == az_name:
+                    logger.info(
+                        'cluster with ReplicationGroupId %s and NodeGroupId %s found with primary node in %s',
+                        replication.replication_group_id,
+                        node.cache_node_id,
+                        node.availability_zone
+                    )
+                    confirm = confirm_choice()
+                    if confirm == 'c':
+                        logger.info('Force automatic failover; no rollback possible')
+                        start_phase('injection')
+                        try:
+                            elasticache_client.test_failover(
+                                ReplicationGroupId=replication.replication_group_id,
+                                NodeGroupId=node.cache_node_id
+                            )
+                            return
+                        except (Exception) as e:
+                            logger.error(e)
                     else:
-                        logger.info(
-                            'Node %s found but not primary', node['CacheClusterId'])
+                        logger.info('Failover aborted')
+
+                elif node.is_primary and node.availability_zone != az_name:
+                    logger.info('Primary node %s found but not in %s', node.cache_cluster_id, az_name)
+
+                else:
+                    logger.info(
+                        'Node %s found but not primary', node.cache_cluster_id)
 
 
 def force_failover_elasticache(
         elasticache_client, elasticache_cluster_name):
     logger = logging.getLogger(__name__)
-    replication_groups = elasticache_client.describe_replication_groups(
+    replication_groups = iter_replication_groups(
+        elasticache_client,
         ReplicationGroupId=elasticache_cluster_name
     )
-    for replication in replication_groups['ReplicationGroups']:
-        if replication['AutomaticFailover'] == 'enabled':
+    for replication in replication_groups:
+        if replication.automatic_failover:
             # find primary node
-            for nodes in replication['NodeGroups']:
-                for node in nodes['NodeGroupMembers']:
-                    if node['CurrentRole'] == 'primary':
-                        NodeGroupId = node['CacheNodeId']
-                        logger.info(
-                            'cluster with ReplicationGroupId %s and NodeGroupId %s found with primary node in %s',
-                            elasticache_cluster_name,
-                            NodeGroupId,
-                            node['PreferredAvailabilityZone']
-                        )
-                        confirm = confirm_choice()
-                        if confirm == 'c':
-                            logger.info('Force automatic failover; no rollback possible')
-                            try:
-                                elasticache_client.test_failover(
-                                    ReplicationGroupId=elasticache_cluster_name,
-                                    NodeGroupId=NodeGroupId
-                                )
-                                return
-                            except (Exception) as e:
-                                logger.error(e)
-                        else:
-                            logger.info('Failover aborted')
+            for node in replication.members:
+                if node.is_primary:
+                    logger.info(
+                        'cluster with ReplicationGroupId %s and NodeGroupId %s found with primary node in %s',
+                        elasticache_cluster_name,
+                        node.cache_node_id,
+                        node.availability_zone
+                    )
+                    confirm = confirm_choice()
+                    if confirm == 'c':
+                        logger.info('Force automatic failover; no rollback possible')
+                        start_phase('injection')
+                        try:
+                            elasticache_client.test_failover(
+                                ReplicationGroupId=elasticache_cluster_name,
+                                NodeGroupId=node.cache_node_id
+                            )
+                            return
+                        except (Exception) as e:
+                            logger.error(e)
+                    else:
+                        logger.info('Failover aborted')
 
 
 def run(region, elasticache_cluster_name=None, az_name=None, vpc_id=None, log_level='INFO'):
@@ -127,6 +141,7 @@ def run(region, elasticache_cluster_name=None, az_name=None, vpc_id=None, log_le
     logger = logging.getLogger(__name__)
     logger.info('Setting up elasticache client for region %s ', region)
     elasticache_client = boto3.client('elasticache', region_name=region)
+    start_phase('discovery')
     if elasticache_cluster_name:
         force_failover_elasticache(
             elasticache_client, elasticache_cluster_name)
@@ -137,13 +152,19 @@ def run(region, elasticache_cluster_name=None, az_name=None, vpc_id=None, log_le
 
 def entry_point():
     args = get_arguments()
-    run(
-        args.region,
-        args.elasticache_cluster_name,
-        args.az_name,
-        args.vpc_id,
-        args.log_level
-    )
+    with profile_run(args.profile) as profiler:
+        with use_cassette(args.record, args.replay, args.replay_realtime) as cassette:
+            run(
+                args.region,
+                args.elasticache_cluster_name,
+                args.az_name,
+                args.vpc_id,
+                args.log_level
+            )
+        if cassette is not None:
+            logging.getLogger(__name__).info('AWS API traffic', extra=cassette.summary())
+    if profiler is not None:
+        logging.getLogger(__name__).info('Profile written', extra=profiler.report())
 
 
 if __name__ == '__main__':
@@ -25,6 +25,15 @@ import boto3
 
 from pythonjsonlogger import jsonlogger
 
+try:
+    from scripts.records import iter_db_instances
+    from scripts.cassette import use_cassette
+    from scripts.profiler import profile_run, start_phase
+except ImportError:  # run as python scripts/fail_rds.py
+    from records import iter_db_instances
+    from cassette import use_cassette
+    from profiler import profile_run, start_phase
+
 
 def setup_logging(log_level):
     logger = logging.getLogger(__name__)
@@ -51,6 +60,14 @@ def get_arguments():
                         help='The name of the AZ where the DB master is.')
     parser.add_argument('--log-level', type=str, default='INFO',
                         help='Python log level. INFO, DEBUG, etc.')
+    parser.add_argument('--record', type=str, default=None, metavar='CASSETTE',
+                        help='Record the AWS API traffic of the run to a cassette file')
+    parser.add_argument('--replay', type=str, default=None, metavar='CASSETTE',
+                        help='Replay the AWS API traffic from a cassette file instead of calling AWS')
+    parser.add_argument('--replay-realtime', default=False, action='store_true',
+                        help='Replay at the recorded latencies instead of full speed')
+    parser.add_argument('--profile', type=str, nargs='?', const='profile', default=None, metavar='PREFIX',
+                        help='Profile the run per phase, write PREFIX.txt, PREFIX.collapsed and PREFIX-<phase>.pstats')
 
     return parser.parse_args()
 
@@ -69,23 +86,23 @@ def confirm_choice():
 def force_failover_rds(rds_client, vpc_id, az_name):
     logger = logging.getLogger(__name__)
     # Find RDS master instances within the AZ
-    rds_dbs = rds_client.describe_db_instances()
-    for rds_db in rds_dbs['DBInstances']:
-        if rds_db['DBSubnetGroup']['VpcId'] == vpc_id:
-            if rds_db['AvailabilityZone'] == az_name and rds_db['MultiAZ']:
+    for rds_db in iter_db_instances(rds_client):
+        if rds_db.vpc_id == vpc_id:
+            if rds_db.availability_zone == az_name and rds_db.multi_az:
                 logger.info(
                     'Database %s found in VPC: %s and AZ: %s',
+                    rds_db.identifier,
                     vpc_id,
-                    rds_db['DBInstanceIdentifier'],
-                    rds_db['AvailabilityZone']
+                    rds_db.availability_zone
                 )
                 # if RDS master is multi-az and in blackholed AZ
                 # force reboot with failover
                 confirm = confirm_choice()
                 if confirm == 'c':
                     logger.info('Force reboot/failover')
+                    start_phase('injection')
                     rsp = rds_client.reboot_db_instance(
-                        DBInstanceIdentifier=rds_db['DBInstanceIdentifier'],
+                        DBInstanceIdentifier=rds_db.identifier,
                         ForceFailover=True
                     )
                     return {
@@ -99,11 +116,8 @@ def force_failover_rds(rds_client, vpc_id, az_name):
 def force_failover_rds_id(rds_client, rds_id):
     logger = logging.getLogger(__name__)
     # Find RDS master instances within the AZ
-    rds_dbs = rds_client.describe_db_instances(
-        DBInstanceIdentifier=rds_id,
-    )
-    for rds_db in rds_dbs['DBInstances']:
-        if rds_db['MultiAZ']:
+    for rds_db in iter_db_instances(rds_client, DBInstanceIdentifier=rds_id):
+        if rds_db.multi_az:
             logger.info(
                 'MultiAZ enabled database found: %s', rds_id
             )
@@ -112,8 +126,9 @@ def force_failover_rds_id(rds_client, rds_id):
             confirm = confirm_choice()
             if confirm == 'c':
                 logger.info('Force reboot/failover')
+                start_phase('injection')
                 rsp = rds_client.reboot_db_instance(
-                    DBInstanceIdentifier=rds_db['DBInstanceIdentifier'],
+                    DBInstanceIdentifier=rds_db.identifier,
                     ForceFailover=True
                 )
                 return {
@@ -129,6 +144,7 @@ def run(region, rds_id=None, az_name=None, vpc_id=None, log_level='INFO'):
     logger = logging.getLogger(__name__)
     logger.info('Setting up rds client for region %s ', region)
     rds_client = boto3.client('rds', region_name=region)
+    start_phase('discovery')
     if rds_id:
         response = force_failover_rds_id(rds_client, rds_id)
     else:
@@ -139,13 +155,19 @@ def run(region, rds_id=None, az_name=None, vpc_id=None, log_level='INFO'):
 def entry_point():
     args = get_arguments()
     print(args)
-    run(
-        args.region,
-        args.rds_id,
-        args.az_name,
-        args.vpc_id,
-        args.log_level
-    )
+    with profile_run(args.profile) as profiler:
+        with use_cassette(args.record, args.replay, args.replay_realtime) as cassette:
+            run(
+                args.region,
+                args.rds_id,
+                args.az_name,
+                args.vpc_id,
+                args.log_level
+            )
+        if cassette is not None:
+            logging.getLogger(__name__).info('AWS API traffic', extra=cassette.summary())
+    if profiler is not None:
+        logging.getLogger(__name__).info('Profile written', extra=profiler.report())
 
 
 if __name__ == '__main__':
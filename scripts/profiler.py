@@ -0,0 +1,209 @@
+"""
+Per-phase profiling of a run
+The run is split in phases (startup, discovery, injection, hold,
+rollback), each one gets its own cProfile data, wall and CPU time and
+tracemalloc allocations. A wall clock stack sampler writes collapsed
+stacks, prefixed with the phase, that flamegraph.pl or speedscope read
+Phases are switched by the thread that started the profiler, cProfile
+only sees that thread while the sampler sees every thread
+"""
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+from collections import Counter
+
+PHASES = ('startup', 'discovery', 'injection', 'hold', 'rollback')
+
+_profiler = None
+
+
+def start_phase(name):
+    # No-op unless the run is profiled
+    if _profiler is not None:
+        _profiler.start_phase(name)
+
+
+class StackSampler(threading.Thread):
+
+    def __init__(self, profiler, interval=0.005):
+        super(StackSampler, self).__init__(name='chaos-profiler')
+        self.daemon = True
+        self.profiler = profiler
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            phase = self.profiler.phase or 'idle'
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('%s (%s:%d)' % (
+                        code.co_name, os.path.basename(code.co_filename),
+                        code.co_firstlineno))
+                    frame = frame.f_back
+                stack.append(phase)
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class Profiler(object):
+
+    def __init__(self, output, top=20, interval=0.005):
+        self.output = output
+        self.top = top
+        self.phase = None
+        self.phases = {}
+        # CPU spent before profiling started: interpreter startup and
+        # imports such as boto3
+        self.pre_profile_cpu = time.process_time()
+        self.sampler = StackSampler(self, interval)
+        self._thread_id = threading.get_ident()
+        self._phase_started = None
+        self._ignored = (tracemalloc.__file__, __file__)
+
+    def start(self):
+        tracemalloc.start()
+        self.sampler.start()
+        self.start_phase('startup')
+
+    def start_phase(self, name):
+        if threading.get_ident() != self._thread_id or name == self.phase:
+            return
+        self._end_phase()
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = {
+                'profile': cProfile.Profile(),
+                'wall': 0.0,
+                'cpu': 0.0,
+                'allocated': 0,
+                'peak': 0,
+                'switch': 0.0,
+                'snapshots': [],
+                'allocations': Counter(),
+            }
+        # Only trace what the phase allocates, this also resets the peak
+        # and keeps the end of phase snapshot small
+        tracemalloc.clear_traces()
+        self.phase = name
+        self._phase_started = (time.monotonic(), time.process_time())
+        stats['profile'].enable()
+
+    def _end_phase(self):
+        if self.phase is None:
+            return
+        stats = self.phases[self.phase]
+        stats['profile'].disable()
+        wall_started, cpu_started = self._phase_started
+        stats['wall'] += time.monotonic() - wall_started
+        stats['cpu'] += time.process_time() - cpu_started
+        # Only take the snapshot here, grouping it would delay the next
+        # phase, e.g. the start of the rollback. This is short since traces
+        # were cleared when the phase started, switch records how long
+        switch_started = time.monotonic()
+        stats['snapshots'].append(tracemalloc.take_snapshot())
+        # peak is the high-water mark, it counts the profiler's allocations
+        stats['peak'] = max(stats['peak'], tracemalloc.get_traced_memory()[1])
+        stats['switch'] += time.monotonic() - switch_started
+        self.phase = None
+
+    def _group_allocations(self):
+        # allocated is what the phase still holds at its end, without the
+        # profiler's own allocations such as the sampled stacks
+        for stats in self.phases.values():
+            for snapshot in stats['snapshots']:
+                # Group first and filter after, filter_traces walks every trace
+                for statistic in snapshot.statistics('lineno'):
+                    if statistic.traceback[0].filename not in self._ignored:
+                        stats['allocations'][str(statistic.traceback)] += statistic.size
+                        stats['allocated'] += statistic.size
+            stats['snapshots'] = []
+
+    def stop(self):
+        self._end_phase()
+        self.sampler.stop()
+        tracemalloc.stop()
+        self._group_allocations()
+        self.write()
+
+    def ordered_phases(self):
+        known = [name for name in PHASES if name in self.phases]
+        return known + sorted(set(self.phases) - set(PHASES))
+
+    def write(self):
+        with open(self.output + '.collapsed', 'w') as collapsed_file:
+            for stack, count in sorted(self.sampler.stacks.items()):
+                collapsed_file.write('%s %d\n' % (stack, count))
+        for name in self.ordered_phases():
+            self.phases[name]['profile'].dump_stats(
+                '%s-%s.pstats' % (self.output, name))
+        with open(self.output + '.txt', 'w') as summary_file:
+            summary_file.write(self.summary())
+
+    def summary(self):
+        lines = ['pre-profile cpu (startup, imports): %.3fs' % self.pre_profile_cpu]
+        for name in self.ordered_phases():
+            stats = self.phases[name]
+            lines.append('')
+            lines.append(
+                '== %s: wall %.3fs, cpu %.3fs, retained %.1f KiB, peak %.1f KiB, '
+                'switch %.3fs' % (
+                    name, stats['wall'], stats['cpu'], stats['allocated'] / 1024.0,
+                    stats['peak'] / 1024.0, stats['switch']))
+            stream = io.StringIO()
+            profile_stats = pstats.Stats(stats['profile'], stream=stream)
+            profile_stats.sort_stats('cumulative').print_stats(self.top)
+            lines.append(stream.getvalue().strip())
+            lines.append('-- top %d allocations' % self.top)
+            for location, size in stats['allocations'].most_common(self.top):
+                lines.append('%10.1f KiB  %s' % (size / 1024.0, location))
+        return '\n'.join(lines) + '\n'
+
+    def report(self):
+        return {
+            'profile_output': self.output,
+            'pre_profile_cpu': round(self.pre_profile_cpu, 3),
+            'phases': {
+                name: {
+                    'wall': round(self.phases[name]['wall'], 3),
+                    'cpu': round(self.phases[name]['cpu'], 3),
+                    'allocated': self.phases[name]['allocated'],
+                    'peak': self.phases[name]['peak'],
+                    'switch': round(self.phases[name]['switch'], 3),
+                }
+                for name in self.ordered_phases()
+            },
+        }
+
+
+@contextlib.contextmanager
+def profile_run(output, top=20):
+    # Does nothing when output is not given
+    global _profiler
+    if not output:
+        yield None
+        return
+    profiler = Profiler(output, top)
+    _profiler = profiler
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        _profiler = None
+        profiler.stop()
@@ -0,0 +1,126 @@
+"""
+Lightweight records for the AWS resources the scripts scan
+Only the fields the scripts use are kept, so the raw boto3
+response pages can be freed as soon as they are converted
+"""
+
+
+class AutoScalingGroup(object):
+    __slots__ = ('name', 'subnets')
+
+    def __init__(self, name, subnets):
+        self.name = name
+        self.subnets = subnets
+
+    @classmethod
+    def from_response(cls, asg):
+        return cls(
+            asg['AutoScalingGroupName'],
+            tuple(asg['VPCZoneIdentifier'].split(','))
+        )
+
+    @property
+    def vpc_zone_identifier(self):
+        return ",".join(self.subnets)
+
+    def __repr__(self):
+        return 'AutoScalingGroup(%s, %s)' % (self.name, self.vpc_zone_identifier)
+
+
+class DBInstance(object):
+    __slots__ = ('identifier', 'availability_zone', 'vpc_id', 'multi_az')
+
+    def __init__(self, identifier, availability_zone, vpc_id, multi_az):
+        self.identifier = identifier
+        self.availability_zone = availability_zone
+        self.vpc_id = vpc_id
+        self.multi_az = multi_az
+
+    @classmethod
+    def from_response(cls, rds_db):
+        return cls(
+            rds_db['DBInstanceIdentifier'],
+            rds_db.get('AvailabilityZone'),
+            rds_db.get('DBSubnetGroup', {}).get('VpcId'),
+            rds_db['MultiAZ']
+        )
+
+    def __repr__(self):
+        return 'DBInstance(%s, %s, %s)' % (
+            self.identifier, self.availability_zone, self.vpc_id)
+
+
+class NodeGroupMember(object):
+    __slots__ = ('cache_cluster_id', 'cache_node_id', 'current_role',
+                 'availability_zone')
+
+    def __init__(self, cache_cluster_id, cache_node_id, current_role,
+                 availability_zone):
+        self.cache_cluster_id = cache_cluster_id
+        self.cache_node_id = cache_node_id
+        self.current_role = current_role
+        self.availability_zone = availability_zone
+
+    @classmethod
+    def from_response(cls, node):
+        return cls(
+            node['CacheClusterId'],
+            node['CacheNodeId'],
+            node.get('CurrentRole'),
+            node.get('PreferredAvailabilityZone')
+        )
+
+    @property
+    def is_primary(self):
+        return self.current_role == 'primary'
+
+    def __repr__(self):
+        return 'NodeGroupMember(%s, %s, %s)' % (
+            self.cache_cluster_id, self.current_role, self.availability_zone)
+
+
+class ReplicationGroup(object):
+    __slots__ = ('replication_group_id', 'automatic_failover', 'members')
+
+    def __init__(self, replication_group_id, automatic_failover, members):
+        self.replication_group_id = replication_group_id
+        self.automatic_failover = automatic_failover
+        self.members = members
+
+    @classmethod
+    def from_response(cls, replication):
+        members = tuple(
+            NodeGroupMember.from_response(node)
+            for nodes in replication['NodeGroups']
+            for node in nodes['NodeGroupMembers']
+        )
+        return cls(
+            replication['ReplicationGroupId'],
+            replication['AutomaticFailover'] == 'enabled',
+            members
+        )
+
+    def __repr__(self):
+        return 'ReplicationGroup(%s, %d members)' % (
+            self.replication_group_id, len(self.members))
+
+
+def iter_auto_scaling_groups(autoscaling_client, **kwargs):
+    paginator = autoscaling_client.get_paginator('describe_auto_scaling_groups')
+    for page in paginator.paginate(**kwargs):
+        for asg in page['AutoScalingGroups']:
+            yield AutoScalingGroup.from_response(asg)
+
+
+def iter_db_instances(rds_client, **kwargs):
+    paginator = rds_client.get_paginator('describe_db_instances')
+    for page in paginator.paginate(**kwargs):
+        for rds_db in page['DBInstances']:
+            yield DBInstance.from_response(rds_db)
+
+
+def iter_replication_groups(elasticache_client, **kwargs):
+    paginator = elasticache_client.get_paginator('describe_replication_groups')
+    for page in paginator.paginate(**kwargs):
+        for replication in page['ReplicationGroups']:
+            yield ReplicationGroup.from_response(replication)
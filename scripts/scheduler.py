@@ -0,0 +1,115 @@
+"""
+Monotonic clock scheduling for fault injection
+The fault window is anchored to the moment injection completes
+and staged waves are fired at fixed offsets from the first one,
+so a slow wave does not push back the ones that follow
+The clock can be swapped for a virtual one, e.g. when a cassette is
+replayed at full speed, so waits finish at once but timings still add up
+"""
+import contextlib
+import threading
+import time
+
+_clock = time.monotonic
+_sleep = time.sleep
+
+
+class VirtualClock(object):
+    __slots__ = ('now', '_lock')
+
+    def __init__(self, start=None):
+        self.now = time.monotonic() if start is None else start
+        self._lock = threading.Lock()
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        with self._lock:
+            self.now += max(0, seconds)
+
+
+def get_clock():
+    return _clock, _sleep
+
+
+@contextlib.contextmanager
+def use_clock(clock, sleep):
+    global _clock, _sleep
+    previous = _clock, _sleep
+    _clock, _sleep = clock, sleep
+    try:
+        yield
+    finally:
+        _clock, _sleep = previous
+
+
+def sleep_until(deadline, clock=None, sleep=None):
+    if clock is None:
+        clock, sleep = get_clock()
+    # time.sleep may return early or late, re-check against the clock
+    remaining = deadline - clock()
+    while remaining > 0:
+        sleep(remaining)
+        remaining = deadline - clock()
+    return clock()
+
+
+def batches(items, size):
+    if not size or size <= 0:
+        return [list(items)] if items else []
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def run_waves(waves, interval, action, clock=None, sleep=None):
+    if clock is None:
+        clock, sleep = get_clock()
+    timings = []
+    started = clock()
+    for index, wave in enumerate(waves):
+        planned = index * interval
+        fired = sleep_until(started + planned, clock, sleep) - started
+        action(wave)
+        timings.append({
+            'wave': index + 1,
+            'size': len(wave),
+            'planned_offset': round(planned, 3),
+            'actual_offset': round(fired, 3),
+            'lag': round(fired - planned, 3),
+            'apply_time': round(clock() - started - fired, 3),
+        })
+    return timings
+
+
+class FaultWindow(object):
+    __slots__ = ('duration', 'started', 'deadline', 'ended', 'clock', 'sleep')
+
+    def __init__(self, duration, clock=None, sleep=None):
+        if clock is None:
+            clock, sleep = get_clock()
+        self.duration = duration
+        self.started = None
+        self.deadline = None
+        self.ended = None
+        self.clock = clock
+        self.sleep = sleep
+
+    def start(self):
+        self.started = self.clock()
+        self.deadline = self.started + self.duration
+        return self.started
+
+    def remaining(self):
+        return max(0, self.deadline - self.clock())
+
+    def wait(self):
+        self.ended = sleep_until(self.deadline, self.clock, self.sleep)
+        return self.ended
+
+    def report(self):
+        actual = self.ended - self.started
+        return {
+            'planned_duration': self.duration,
+            'actual_duration': round(actual, 3),
+            'overrun': round(actual - self.duration, 3),
+        }
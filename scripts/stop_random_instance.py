@@ -7,10 +7,20 @@ import argparse
 import logging
 import boto3
 import random
-import time
 
 from pythonjsonlogger import jsonlogger
 
+try:
+    from scripts.scheduler import FaultWindow
+    from scripts.verify import verify_and_repair
+    from scripts.cassette import use_cassette
+    from scripts.profiler import profile_run, start_phase
+except ImportError:  # run as python scripts/stop_random_instance.py
+    from scheduler import FaultWindow
+    from verify import verify_and_repair
+    from cassette import use_cassette
+    from profiler import profile_run, start_phase
+
 
 def setup_logging(log_level):
     logger = logging.getLogger(__name__)
@@ -37,11 +47,20 @@ def get_arguments():
                         help='Filter instances by tag name:value')
     parser.add_argument('--duration', type=int, default=60,
                         help='Duration (s) before restarting the instance')
+    parser.add_argument('--record', type=str, default=None, metavar='CASSETTE',
+                        help='Record the AWS API traffic of the run to a cassette file')
+    parser.add_argument('--replay', type=str, default=None, metavar='CASSETTE',
+                        help='Replay the AWS API traffic from a cassette file instead of calling AWS')
+    parser.add_argument('--replay-realtime', default=False, action='store_true',
+                        help='Replay at the recorded latencies instead of full speed')
+    parser.add_argument('--profile', type=str, nargs='?', const='profile', default=None, metavar='PREFIX',
+                        help='Profile the run per phase, write PREFIX.txt, PREFIX.collapsed and PREFIX-<phase>.pstats')
     return parser.parse_args()
 
 
 def stop_random_instance(ec2_client, az_name, tag):
     logger = logging.getLogger(__name__)
+    start_phase('discovery')
     paginator = ec2_client.get_paginator('describe_instances')
     pages = paginator.paginate(
         Filters=[
@@ -74,6 +93,7 @@ def stop_random_instance(ec2_client, az_name, tag):
     if len(instance_list) > 0:
         selected_instance = random.choice(instance_list)
         logger.info("Randomly selected %s", selected_instance)
+        start_phase('injection')
         ec2_client.stop_instances(
             InstanceIds=[selected_instance]
         )
@@ -87,9 +107,43 @@ def stop_random_instance(ec2_client, az_name, tag):
 def rollback(ec2_client, instance_id):
     logger = logging.getLogger(__name__)
     logger.info('Restarting the instance %s', instance_id)
-    ec2_client.start_instances(
-            InstanceIds=[instance_id]
+    # e.g. IncorrectInstanceState while still stopping,
+    # the verification pass retries it
+    try:
+        ec2_client.start_instances(
+                InstanceIds=[instance_id]
+        )
+    except Exception as e:
+        logger.error('Unable to restart the instance %s: %s', instance_id, e)
+
+
+def get_stopped_instances(ec2_client, instance_ids):
+    # pending instances are still drifting, start_instances is a no-op on them
+    response = ec2_client.describe_instances(InstanceIds=instance_ids)
+    return [
+        instance['InstanceId']
+        for reservation in response['Reservations']
+        for instance in reservation['Instances']
+        if instance['State']['Name'] != 'running'
+    ]
+
+
+def verify_rollback(ec2_client, instance_id, started=None):
+    logger = logging.getLogger(__name__)
+    logger.info('Verifying the instance %s is running', instance_id)
+    # Instances take longer to converge than network associations
+    report = verify_and_repair(
+        lambda: get_stopped_instances(ec2_client, [instance_id]),
+        lambda stopped_id: ec2_client.start_instances(InstanceIds=[stopped_id]),
+        max_attempts=8,
+        delay=5,
+        started=started
     )
+    if report['clean']:
+        logger.info('Rollback verified clean', extra=report)
+    else:
+        logger.error('Rollback drift remains', extra=report)
+    return report['clean']
 
 
 def run(region, az_name, tag, duration, log_level='INFO'):
@@ -101,19 +155,31 @@ def run(region, az_name, tag, duration, log_level='INFO'):
         ec2_client, az_name, tag)
 
     if instance_id and duration:
-        time.sleep(duration)
+        fault_window = FaultWindow(duration)
+        fault_window.start()
+        start_phase('hold')
+        fault_window.wait()
+        logger.info('Fault window ended', extra=fault_window.report())
+        start_phase('rollback')
         rollback(ec2_client, instance_id)
+        verify_rollback(ec2_client, instance_id, fault_window.ended)
 
 
 def entry_point():
     args = get_arguments()
-    run(
-        args.region,
-        args.az_name,
-        args.tag,
-        args.duration,
-        args.log_level
-    )
+    with profile_run(args.profile) as profiler:
+        with use_cassette(args.record, args.replay, args.replay_realtime) as cassette:
+            run(
+                args.region,
+                args.az_name,
+                args.tag,
+                args.duration,
+                args.log_level
+            )
+        if cassette is not None:
+            logging.getLogger(__name__).info('AWS API traffic', extra=cassette.summary())
+    if profiler is not None:
+        logging.getLogger(__name__).info('Profile written', extra=profiler.report())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,61 @@
+"""
+Post-rollback verification
+Compare the live state with the saved baseline in a single
+batched describe, repair any drift concurrently and retry a
+bounded number of times until the state is verified clean
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from scripts.scheduler import get_clock
+except ImportError:  # run as python scripts/<script>.py
+    from scheduler import get_clock
+
+
+def verify_and_repair(check, repair, max_attempts=5, delay=2, max_delay=30,
+                      max_workers=8, started=None,
+                      clock=None, sleep=None):
+    # check() returns the list of drifted items, repair(item) fixes one
+    if clock is None:
+        clock, sleep = get_clock()
+    if started is None:
+        started = clock()
+    errors = []
+    repaired = 0
+    drift = []
+    for attempt in range(1, max_attempts + 1):
+        drift = check()
+        if not drift:
+            return {
+                'clean': True,
+                'attempts': attempt,
+                'repaired': repaired,
+                'time_to_clean': round(clock() - started, 3),
+            }
+        if attempt == max_attempts:
+            break
+        workers = min(max_workers, len(drift))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda item: _try_repair(repair, item), drift))
+        # only keep the errors of the latest repair round
+        errors = []
+        for error in results:
+            if error is None:
+                repaired += 1
+            else:
+                errors.append(error)
+        sleep(min(delay * 2 ** (attempt - 1), max_delay))
+    return {
+        'clean': False,
+        'attempts': max_attempts,
+        'repaired': repaired,
+        'drift': [str(item) for item in drift],
+        'errors': errors,
+    }
+
+
+def _try_repair(repair, item):
+    try:
+        repair(item)
+    except Exception as e:
+        return '%s: %s' % (item, e)